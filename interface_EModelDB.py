@@ -1,55 +1,37 @@
 import streamlit as st
-import pandas as pd
 import sqlite3
+import math
 from io import BytesIO
 import zipfile
 
 # This line must be placed before displaying any element in the app
 st.set_page_config(layout="wide")
-st.markdown("""
-    <style>
-        /* Adjust the sidebar */
-        [data-testid="stSidebar"] {
-            min-width: 300px;
-            max-width: 300px;
-        }
-        /* Adjust font size inside the sidebar */
-        [data-testid="stSidebar"] * {
-            font-size: 18px !important;
-        }
-        /* Ensure the main block does not have large margins */
-        [data-testid="stAppViewContainer"] .main .block-container {
-            padding-left: 1rem;
-            padding-right: 1rem;
-        }
-        /* Adjust global font size */
-        html, body, [class*="css"]  {
-            font-size: 18px; /* Adjust font size here */
-        }
-
-        /* Ensure the table spans full width and adjust font size */
-        .streamlit-table {
-            width: 100% !important;
-            font-size: 18px; /* Adjust table font size */
-        }
-        
-        /* Adjust font size in table cells */
-        table td, table th {
-            font-size: 18px !important;
-        }
-
-        /* Adjust font size of custom headers */
-        .custom-header {
-            font-size: 22px !important; /* Slightly larger header */
-            font-weight: bold;
-        }
-    </style>
-""", unsafe_allow_html=True)
-
-
-# SQLite database connection
+
+# Custom styles, read from style.css once per process
+@st.cache_data
+def load_css():
+    with open('style.css') as f:
+        return f"<style>{f.read()}</style>"
+
+st.markdown(load_css(), unsafe_allow_html=True)
+
+# Relative column widths shared by the table header and every results row
+COL_WIDTHS = [2, 4, 4, 5, 5, 4]
+
+# Number of models rendered per results page
+PAGE_SIZE = 25
+
+# Read size used when streaming matrices from SQLite into the download ZIP
+BLOB_CHUNK_SIZE = 65536
+
+
+# SQLite database connection (read-only, shared across reruns and sessions)
+@st.cache_resource
 def get_connection():
-    return sqlite3.connect('models.db')
+    conn = sqlite3.connect('file:models.db?mode=ro', uri=True, check_same_thread=False)
+    conn.execute('PRAGMA query_only=1')
+    conn.execute('PRAGMA mmap_size=268435456')  # Memory-map up to 256 MB of the database file
+    return conn
 
 # Function to query the database and apply filters
 def query_database(author, name_model, year, taxonomic_group, matrix_type, comments, sort_by):
@@ -60,73 +42,80 @@ def query_database(author, name_model, year, taxonomic_group, matrix_type, comme
                FROM AMINOACID_SUBSTITUTION_MODELS
                WHERE 1=1"""
     
-    # Apply filters based on input fields
+    params = []
+
+    # Apply filters based on input fields (parameterised, case-insensitive substring match)
     if author:
-        query += f" AND lower(author) LIKE '%{author.lower()}%'"
+        query += " AND author LIKE ('%' || ? || '%') COLLATE NOCASE"
+        params.append(author)
     if name_model:
-        query += f" AND lower(name) LIKE '%{name_model.lower()}%'"
+        query += " AND name LIKE ('%' || ? || '%') COLLATE NOCASE"
+        params.append(name_model)
     if year:
-        query += f" AND strftime('%Y', publication_date) = '{year}'"
+        query += " AND publication_date = ?"
+        params.append(year.strip())
     if taxonomic_group:
-        query += f" AND lower(taxonomic_group) LIKE '%{taxonomic_group.lower()}%'"
+        query += " AND taxonomic_group LIKE ('%' || ? || '%') COLLATE NOCASE"
+        params.append(taxonomic_group)
     if matrix_type:
-        query += f" AND lower(matrix_type) LIKE '%{matrix_type.lower()}%'"
+        query += " AND matrix_type LIKE ('%' || ? || '%') COLLATE NOCASE"
+        params.append(matrix_type)
     if comments:
-        query += f" AND lower(comments) LIKE '%{comments.lower()}%'"
+        query += " AND comments LIKE ('%' || ? || '%') COLLATE NOCASE"
+        params.append(comments)
     
     # Sort results based on the selected field
     query += f' ORDER BY "{sort_by}" ASC'
 
-    # Execute query
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+    # Execute query: rows of (Name, Author, PublicationDate, Article, TaxonomicGroup, MatrixType, Comments)
+    return conn.execute(query, params).fetchall()
 
-# Function to get taxonomic group options from the database
-def get_taxonomic_group_options():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT DISTINCT taxonomic_group FROM AMINOACID_SUBSTITUTION_MODELS')
-    taxonomic_group_options = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    taxonomic_group_options.insert(0, "")  # Empty option to allow searches without a filter
-    return taxonomic_group_options
-
-# Function to get matrix type options from the database
-def get_matrix_type_options():
+# Function to get the taxonomic group and matrix type options from the database with a single query
+@st.cache_data(ttl=3600)
+def get_option_sets():
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute('SELECT DISTINCT matrix_type FROM AMINOACID_SUBSTITUTION_MODELS')
-    matrix_type_options = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    matrix_type_options.insert(0, "")  # Empty option to allow searches without a filter
-    return matrix_type_options
-
-# Function to download selected matrices into a ZIP file
+    cursor.execute('SELECT DISTINCT taxonomic_group, matrix_type FROM AMINOACID_SUBSTITUTION_MODELS')
+    rows = cursor.fetchall()
+    # Empty option to allow searches without a filter, then each distinct value in order of appearance
+    taxonomic_group_options = list(dict.fromkeys(["", *(row[0] for row in rows)]))
+    matrix_type_options = list(dict.fromkeys(["", *(row[1] for row in rows)]))
+    return taxonomic_group_options, matrix_type_options
+
+# Function to download selected matrices into a ZIP file (cached per selection, bounded in size and age)
+@st.cache_data(max_entries=64, ttl=3600)
 def download_matrices(selected_models):
     conn = get_connection()
     cursor = conn.cursor()
+
+    # Look up the rowid of every selected matrix with a single query
+    placeholders = ','.join('?' * len(selected_models))
+    cursor.execute(f'SELECT model_id, id FROM SUBSTITUTION_MATRIX '
+                   f'WHERE model_id IN ({placeholders}) AND binary_matrix IS NOT NULL',
+                   list(selected_models))
+    matrix_ids = dict(cursor.fetchall())
     
     # Create an in-memory ZIP file
     zip_buffer = BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
+    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zipf:
         for model in selected_models:
-            cursor.execute('SELECT binary_matrix FROM SUBSTITUTION_MATRIX WHERE model_id = ?', (model,))
-            matrix_data = cursor.fetchone()
-            if matrix_data:
-                # Add the matrix to the ZIP
-                zipf.writestr(f"{model}_matrix.txt", matrix_data[0])
+            matrix_id = matrix_ids.get(model)
+            if matrix_id is not None:
+                # Stream the matrix into the ZIP without loading the whole blob in memory
+                with conn.blobopen('SUBSTITUTION_MATRIX', 'binary_matrix', matrix_id, readonly=True) as blob, \
+                        zipf.open(f"{model}_matrix.txt", "w") as zf:
+                    while chunk := blob.read(BLOB_CHUNK_SIZE):
+                        zf.write(chunk)
 
-    zip_buffer.seek(0)
-    conn.close()
-    return zip_buffer
+    return zip_buffer.getvalue()
 
 # Sidebar with filters
 st.sidebar.title("Filters")
 
 # Filters
-matrix_type = st.sidebar.selectbox("Matrix Type", options=get_matrix_type_options())
-taxonomic_group = st.sidebar.selectbox("Taxonomic Group", options=get_taxonomic_group_options())
+taxonomic_group_options, matrix_type_options = get_option_sets()
+matrix_type = st.sidebar.selectbox("Matrix Type", options=matrix_type_options)
+taxonomic_group = st.sidebar.selectbox("Taxonomic Group", options=taxonomic_group_options)
 name_model = st.sidebar.text_input("Model Name")
 author = st.sidebar.text_input("Author/s")
 year = st.sidebar.text_input("Publication Year")
@@ -136,28 +125,27 @@ comments = st.sidebar.text_input("Comments")
 sort_by = st.sidebar.selectbox("Sort by", options=["Name", "Author", "PublicationDate", "TaxonomicGroup", "MatrixType"])
 
 # Query database with filters
-df_results = query_database(author, name_model, year, taxonomic_group, matrix_type, comments, sort_by)
-
-# Modify the article column to include author, date, and link
-df_results['References'] = df_results.apply(
-    lambda row: f'<a href="{row["Article"]}">{row["Author"]} ({row["PublicationDate"]})</a>', axis=1
-)
-
-# Drop the Author and PublicationDate columns after creating the References column
-df_results.drop(columns=['Author', 'PublicationDate', 'Article'], inplace=True)
+results = query_database(author, name_model, year, taxonomic_group, matrix_type, comments, sort_by)
 
-# Reorder columns
-df_results = df_results[['Name', 'MatrixType', 'TaxonomicGroup', 'Comments', 'References']]
-
-# Add selection checkboxes for each row manually using a dictionary
-selected_rows = {row['Name']: False for i, row in df_results.iterrows()}
+# Keep the checkbox selection in session state so it persists across pages
+if 'selected' not in st.session_state:
+    st.session_state.selected = set()
+selected = st.session_state.selected
 
 # Add headers manually with the names of each column
 st.write("# EModelDB")
 st.write("### Database of Empirical Substitution Models of Protein Evolution")
 
+# Page selector: only the rows of the current page are rendered
+n_pages = max(math.ceil(len(results) / PAGE_SIZE), 1)
+page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1)
+page_rows = results[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+
+# Build the references column (author, date and link to the article) for the rows on this page
+references = [f'<a href="{article}">{authors} ({date})</a>' for _, authors, date, article, _, _, _ in page_rows]
+
 # Display headers
-header_cols = st.columns([2, 4, 4, 5, 5, 4])  # Adjust column widths
+header_cols = st.columns(COL_WIDTHS)
 header_cols[0].markdown("<div class='custom-header'>Select</div>", unsafe_allow_html=True)
 header_cols[1].markdown("<div class='custom-header'>Name</div>", unsafe_allow_html=True)
 header_cols[2].markdown("<div class='custom-header'>Matrix Type</div>", unsafe_allow_html=True)
@@ -167,30 +155,28 @@ header_cols[5].markdown("<div class='custom-header'>References</div>", unsafe_al
 
 
 # Display table row by row with aligned elements
-for i, row in df_results.iterrows():
-    cols = st.columns([2, 4, 4, 5, 5, 4])  # Adjust column widths
-    selected_rows[row['Name']] = cols[0].checkbox("", key=f"select_{i}", value=selected_rows[row['Name']])  # Column for checkbox
-    cols[1].write(row['Name'])
-    cols[2].write(row['MatrixType'])
-    cols[3].write(row['TaxonomicGroup'])
-    cols[4].write(row['Comments'])
-    cols[5].markdown(row['References'], unsafe_allow_html=True)
+for (name, _, _, _, group, m_type, notes), reference in zip(page_rows, references):
+    cols = st.columns(COL_WIDTHS)
+    if cols[0].checkbox("", key=f"select_{name}", value=name in selected):  # Column for checkbox
+        selected.add(name)
+    else:
+        selected.discard(name)
+    cols[1].write(name)
+    cols[2].write(m_type)
+    cols[3].write(group)
+    cols[4].write(notes)
+    cols[5].markdown(reference, unsafe_allow_html=True)
 
 
 # "Select All" button to select all rows (place it at the end)
 select_all = st.checkbox("Select All", value=False)
 
-# If "Select All" is checked, select all rows
-if select_all:
-    for name in selected_rows.keys():
-        selected_rows[name] = True
-
-# Create a list with the selected models
-selected_models = [name for name, selected in selected_rows.items() if selected]
+# Create a list with the selected models among the current results (all of them if "Select All" is checked)
+selected_models = [row[0] for row in results if select_all or row[0] in selected]
 
 # Show download button if models are selected
 if selected_models:
-    zip_data = download_matrices(selected_models)
+    zip_data = download_matrices(tuple(sorted(selected_models)))
     st.download_button(
         label="Download Selected Matrices as ZIP",
         data=zip_data,
@@ -0,0 +1,10 @@
+-- Indexes used by interface_EModelDB.py; apply with: sqlite3 models.db < migrations/add_indexes.sql
+
+-- Publication year filter (publication_date = ?) and sorting by date
+CREATE INDEX IF NOT EXISTS idx_models_pubdate ON AMINOACID_SUBSTITUTION_MODELS(publication_date);
+
+-- Matrix lookup by model when building the download ZIP (model_id IN (...))
+CREATE INDEX IF NOT EXISTS idx_matrix_model_id ON SUBSTITUTION_MATRIX(model_id);
+
+-- Refresh the query planner statistics
+ANALYZE;